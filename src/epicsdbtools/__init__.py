@@ -6,9 +6,10 @@ from .parsers import (
     Record,
     RecordType,
     RecordTypeT,
+    Substitution,
     load_database_file,
+    load_substitution_databases,
     load_substitution_file,
-    Substitution,
 )
 
 __all__ = [
@@ -20,6 +21,7 @@ __all__ = [
     "RecordTypeT",
     "load_database_file",
     "LoadIncludesStrategy",
+    "load_substitution_databases",
     "load_substitution_file",
     "set_log_level",
 ]
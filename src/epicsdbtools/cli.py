@@ -23,13 +23,14 @@ def get_cli_modules() -> dict[str, CLIModuleProtocol]:
             )
             if not isinstance(cli_module, CLIModuleProtocol):
                 logger.warning(
-                    f"Module {command} does not conform to CLIModuleProtocol. Skipping."
+                    "Module %s does not conform to CLIModuleProtocol. Skipping.",
+                    command,
                 )
                 continue
             cli_modules[command] = cli_module
         except Exception:
             logger.error(
-                f"Failed to import CLI module for command: {command}", exc_info=True
+                "Failed to import CLI module for command: %s", command, exc_info=True
             )
     return cli_modules
 
@@ -41,7 +42,7 @@ def create_cli_module_subparsers(
         dest="command", help="Available commands", required=True
     )
     for command in cli_modules.keys():
-        logger.debug(f"Adding CLI subcommand: {command}")
+        logger.debug("Adding CLI subcommand: %s", command)
 
         if hasattr(cli_modules[command], "__doc__"):
             cli_module_parser = subparsers.add_parser(
@@ -57,7 +58,7 @@ def create_cli_module_subparsers(
             if callable(add_parser_args_fn):
                 add_parser_args_fn(cli_module_parser)
         else:
-            logger.debug(f"No add_parser_args function found for command: {command}")
+            logger.debug("No add_parser_args function found for command: %s", command)
 
 
 def main():
@@ -74,7 +75,7 @@ def main():
     if hasattr(cli_modules[args.command], "main"):
         cli_modules[args.command].main(args)
     else:
-        logger.error(f"No main function found for command: {args.command}")
+        logger.error("No main function found for command: %s", args.command)
 
 
 if __name__ == "__main__":
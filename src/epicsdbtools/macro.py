@@ -1,10 +1,10 @@
 import re
-from io import StringIO
 from re import Pattern
 
 from .tokenizer import Tokenizer
 
-MACRO_REGEX: Pattern = re.compile(r"\$\(([^)=]+)(=([^)]*))?\)")
+# Captures the macro name and, if present, its default value
+MACRO_REGEX: Pattern = re.compile(r"\$\(([^)=]+)(?:=([^)]*))?\)")
 
 
 def macro_expand(source: str, macros: dict[str, str]) -> tuple[str, list[str]]:
@@ -12,36 +12,62 @@ def macro_expand(source: str, macros: dict[str, str]) -> tuple[str, list[str]]:
     >>> macro_expand('$(A) $(B) $(C=3)', {'A': '1'})
     ('1 $(B) 3', ['B'])
     """
+    # A plain substring search is much cheaper than running the regex
+    if "$(" not in source:
+        return source, []
+
     unmatched = set()
+    rescan = False
+    lookup = macros.get
 
     def replace(matchobj: re.Match) -> str:
-        name = matchobj.group(1)
-        default = matchobj.group(3)
-        value = macros.get(name)
+        nonlocal rescan
+        name, default = matchobj.groups()
+        value = lookup(name, default)
         if value is None:
-            if default is None:
-                unmatched.add(name)
-                return f"$({name})"
-            else:
-                return default
-        else:
-            return value
+            # Leave the reference untouched; it is already in canonical form
+            unmatched.add(name)
+            return matchobj.group(0)
+        # Only substituted text can introduce new macro references, either
+        # itself or by joining a "$" and a "(" on either side of an empty value
+        if not value or "$" in value or value.startswith("("):
+            rescan = True
+        return value
 
     while True:
+        rescan = False
         expanded = MACRO_REGEX.sub(replace, source)
-        if expanded == source:
+        # Compare against the previous pass only when a rescan was requested;
+        # this stops self-referencing macros such as A=$(A) from looping forever
+        if not rescan or expanded == source:
             break
         source = expanded
 
     return expanded, list(unmatched)
 
 
+def find_unmatched_macros(source: str) -> dict[int, list[str]]:
+    """
+    Locate macros left over after expansion, grouped by line number.
+
+    >>> find_unmatched_macros('$(A)\\nno macros\\n$(B) $(C)')
+    {1: ['A'], 3: ['B', 'C']}
+    """
+    unmatched: dict[int, list[str]] = {}
+    lineno, pos = 1, 0
+    for matchobj in MACRO_REGEX.finditer(source):
+        lineno += source.count("\n", pos, matchobj.start())
+        pos = matchobj.start()
+        unmatched.setdefault(lineno, []).append(matchobj.group(1))
+    return unmatched
+
+
 def macro_split(macro_string: str) -> dict[str, str]:
     """
     >>> print(macro_split('a=1,b="2",c,d=\\'hello\\''))
     {'a': '1', 'b': '2', 'd': 'hello'}
     """
-    src = Tokenizer(StringIO(macro_string))
+    src = Tokenizer(macro_string)
 
     macros = {}
     name = None
@@ -6,7 +6,11 @@ from .database import (
     RecordTypeT,
     load_database_file,
 )
-from .substitution import load_substitution_file, Substitution
+from .substitution import (
+    Substitution,
+    load_substitution_databases,
+    load_substitution_file,
+)
 
 __all__ = [
     "Database",
@@ -14,6 +18,7 @@ __all__ = [
     "Substitution",
     "load_database_file",
     "LoadIncludesStrategy",
+    "load_substitution_databases",
     "load_substitution_file",
     "RecordType",
     "RecordTypeT",
@@ -1,15 +1,16 @@
 #!/usr/bin/env python
 
+import logging
+import mmap
 import os
-from collections import OrderedDict
+import sys
 from collections.abc import Iterator
 from enum import StrEnum
-from io import StringIO
 from pathlib import Path
 from typing import Generic, TypeVar
 
 from ..log import logger
-from ..macro import macro_expand, macro_split
+from ..macro import find_unmatched_macros, macro_expand, macro_split
 from ..tokenizer import Tokenizer
 
 
@@ -54,6 +55,9 @@ class RecordType(StrEnum):
     WAVEFORM = "waveform"  # Waveform Record
 
 
+# Maps record type names as written in database files to their enum members
+_RTYPE_BY_VALUE: dict[str, RecordType] = {rtype.value: rtype for rtype in RecordType}
+
 RecordTypeT = TypeVar("RecordTypeT", bound=RecordType)
 
 
@@ -71,24 +75,42 @@ class DatabaseException(Exception):
         return self.msg
 
 
+def _append_record_lines(record: "Record", parts: list[str]) -> None:
+    parts.append(f'record ({record.rtype.value}, "{record.name}")' + " {\n")
+    for field, value in record.fields.items():
+        parts.append(f'    field({field:4}, "{value}")\n')
+    for field, value in record.infos.items():
+        parts.append(f'    info({field}, "{value}")\n')
+    for alias in record.aliases:
+        parts.append(f"    alias({alias})\n")
+    parts.append("}\n")
+
+
 class Record(Generic[RecordTypeT]):
+    __slots__ = ("name", "rtype", "infos", "fields", "aliases")
+
     def __init__(self, name: str, rtype: RecordTypeT | str):
         self.name = name
         self.rtype = rtype if isinstance(rtype, RecordType) else RecordType(rtype)
-        self.infos: OrderedDict[str, str] = OrderedDict()
-        self.fields: OrderedDict[str, str | int] = OrderedDict()
+        self.infos: dict[str, str] = {}
+        self.fields: dict[str, str | int] = {}
         self.aliases: list[str] = []
 
     def __repr__(self) -> str:
-        repr = f'record ({self.rtype.value}, "{self.name}")' + " {\n"
-        for field, value in self.fields.items():
-            repr += f'    field({field:4}, "{value}")\n'
-        for field, value in self.infos.items():
-            repr += f'    info({field}, "{value}")\n'
-        for alias in self.aliases:
-            repr += f"    alias({alias})\n"
-        repr += "}\n"
-        return repr
+        parts: list[str] = []
+        _append_record_lines(self, parts)
+        return "".join(parts)
+
+    def copy(self) -> "Record":
+        """
+        Return a copy of the record that can be modified independently.
+        """
+        record = Record(self.name, self.rtype)
+        # dict.copy() clones the hash table at its final size in one go
+        record.fields = self.fields.copy()
+        record.infos = self.infos.copy()
+        record.aliases = self.aliases.copy()
+        return record
 
     def merge(self, another: "Record") -> None:
         """
@@ -105,27 +127,55 @@ class Record(Generic[RecordTypeT]):
         self.aliases.extend(another.aliases)
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, Record):
             return False
+        # Plain dicts ignore ordering on comparison; compare the items as lists
+        # so that field and info order stays significant as it was with OrderedDict
         return (
             self.name == other.name
             and self.rtype == other.rtype
-            and self.fields == other.fields
-            and self.infos == other.infos
+            and list(self.fields.items()) == list(other.fields.items())
+            and list(self.infos.items()) == list(other.infos.items())
             and self.aliases == other.aliases
         )
 
 
-class Database(OrderedDict[str, Record]):
+class Database(dict[str, Record]):
+    __slots__ = ("_included_templates",)
+
     def __init__(self):
         super().__init__()
         self._included_templates: dict[str, Database | None] = {}
 
+    def copy(self, deep: bool = False) -> "Database":
+        """
+        Return a shallow copy of the database, including its included templates.
+
+        With deep=True the records and included template databases are copied
+        too, so the copy can be modified without affecting the original.
+        """
+        database = Database()
+        if deep:
+            for name, record in self.items():
+                database[name] = record.copy()
+        else:
+            database.update(self)
+        for template, included_db in self._included_templates.items():
+            if deep and included_db is not None:
+                included_db = included_db.copy(deep=True)
+            database.add_included_template(template, included_db)
+        return database
+
     def __repr__(self) -> str:
-        msg = []
+        # Collect every record's lines into one buffer and join once at the end
+        parts: list[str] = []
         for record in self.values():
-            msg.append(repr(record))
-        return "\n".join(msg)
+            if parts:
+                parts.append("\n")
+            _append_record_lines(record, parts)
+        return "".join(parts)
 
     def add_record(self, record: "Record[RecordTypeT]") -> None:
 
@@ -137,10 +187,10 @@ class Database(OrderedDict[str, Record]):
                     f" conflicting record type '{record.rtype}'"
                 )
             else:
-                logger.warning(f"Merging into existing record: '{record.name}'")
+                logger.warning("Merging into existing record: '%s'", record.name)
                 record_existed.merge(record)
         else:
-            logger.debug(f"Adding record: '{record.name}'")
+            logger.debug("Adding record: '%s'", record.name)
             self[record.name] = record
 
     def merge(self, database: "Database") -> None:
@@ -160,13 +210,17 @@ class Database(OrderedDict[str, Record]):
         return list(self._included_templates.keys())
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, Database):
             return False
+        # Also makes the comparison symmetric, as only records in self are looked up
+        if len(self) != len(other):
+            return False
 
-        for record_name in self.keys():
-            if record_name not in other.keys() or other.get(record_name) != self.get(
-                record_name
-            ):
+        # A single lookup per record; records missing from other come back as None
+        for record_name, record in self.items():
+            if other.get(record_name) != record:
                 return False
         return True
 
@@ -175,22 +229,20 @@ def parse_pair(src: Iterator[str]) -> tuple[str | None, str | None]:
     """
     parse '(field, "value")' definition to tuple (field, value)
     """
-    token = next(src)
-    if token != "(":
+    next_token = src.__next__
+    if next_token() != "(":
         return None, None
-    token = next(src)
-    field = token
-    token = next(src)
-    if token == ")":
+    field = next_token()
+    token = next_token()
+    # check for the common '(field, "value")' shape first
+    if token == ",":
+        value = next_token()
+        if next_token() != ")":
+            return None, None
+        return field, value
+    elif token == ")":
         return field, None
-    elif token != ",":
-        return None, None
-    token = next(src)
-    value = token
-    token = next(src)
-    if token != ")":
-        return None, None
-    return field, value
+    return None, None
 
 
 def parse_record(src: Iterator[str]) -> Record:
@@ -203,43 +255,69 @@ def parse_record(src: Iterator[str]) -> Record:
         raise DatabaseException(
             f"Failed to parse record signature! Name: '{name}', Rtype: '{rtype}'"
         )
-    elif rtype not in RecordType:
+
+    record_type = _RTYPE_BY_VALUE.get(rtype)
+    if record_type is None:
         raise DatabaseException(f"Invalid record type '{rtype}' for record '{name}'")
 
-    record = Record(name=name, rtype=RecordType[rtype.upper()])
+    record = Record(name=name, rtype=record_type)
+    aliases = record.aliases
+    # Checked once per record rather than for each of its fields
+    debug = logger.isEnabledFor(logging.DEBUG)
 
-    token = next(src)
-    while True:
-        if token == "}":
-            break
-        elif token in ("field", "info", "alias"):
+    # Dispatch table from keyword to the dict its definitions are stored in
+    targets = {"field": record.fields, "info": record.infos}
+
+    next_token = src.__next__
+    token = next_token()
+    while token != "}":
+        target = targets.get(token)
+        if target is not None:
             key, value = parse_pair(src)
-            if token in ("field", "info") and key and value:
-                logger.debug(f"Setting {token} '{key}' for record '{record.name}'")
-                getattr(record, f"{token}s")[key] = value
-            elif token == "alias" and key:
-                record.aliases.append(key)
+            if key and value:
+                if debug:
+                    logger.debug(
+                        "Setting %s '%s' for record '%s'", token, key, record.name
+                    )
+                # Field and info names come from a small vocabulary, so share them,
+                # as do device types which repeat across most records in a file
+                key = sys.intern(key)
+                if key == "DTYP":
+                    value = sys.intern(value)
+                target[key] = value
             else:
-                logger.warning(f"Invalid {token} definition for record '{record.name}'")
+                logger.warning(
+                    "Invalid %s definition for record '%s'", token, record.name
+                )
+        elif token == "alias":
+            key, _ = parse_pair(src)
+            if key:
+                aliases.append(key)
+            else:
+                logger.warning(
+                    "Invalid %s definition for record '%s'", token, record.name
+                )
 
-        token = next(src)
+        token = next_token()
 
-    logger.debug(f"Parsed record: '{record.name}'")
+    logger.debug("Parsed record: '%s'", record.name)
     return record
 
 
 def find_database_file(
-    filename: Path | str, search_path: set[Path] | None = None
+    filename: Path | str, search_path: set[Path] | frozenset[Path] | None = None
 ) -> Path:
     if isinstance(filename, str):
         filename = Path(filename)
 
-    if filename.exists() and filename.is_file():
+    # is_file() is a single stat() and is also False for missing paths
+    if filename.is_file():
         return filename.absolute()
-    elif not filename.is_absolute() and search_path is not None:
-        for path in search_path:
+    elif not filename.is_absolute() and search_path:
+        # Sorting gives the same search order no matter how the set was built
+        for path in sorted(search_path):
             database_file = path / filename
-            if database_file.exists() and database_file.is_file():
+            if database_file.is_file():
                 return database_file.absolute()
 
     raise FileNotFoundError(
@@ -247,57 +325,181 @@ def find_database_file(
     )
 
 
+def read_database_file(filename: Path) -> str:
+    """
+    Read the full contents of a database file, decoding them in one go.
+
+    The file is memory mapped where possible so it is decoded straight from the
+    page cache, rather than being copied into an intermediate bytes object first.
+    """
+    with open(filename, "rb") as fp:
+        try:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return str(mm, "utf-8")
+        except (ValueError, OSError):
+            # Empty files and special files cannot be memory mapped
+            return fp.read().decode("utf-8")
+
+
+class _DatabaseFileFrame:
+    """
+    Parsing state of one file in the chain of includes being loaded.
+    """
+
+    __slots__ = ("filename", "key", "inclusion", "src", "search_path", "database")
+
+    def __init__(
+        self,
+        filename: Path,
+        key: tuple,
+        inclusion: str | None,
+        src: Iterator[str],
+        search_path: frozenset[Path],
+    ):
+        self.filename = filename
+        self.key = key
+        self.inclusion = inclusion
+        self.src = src
+        # includes of this file are searched for relative to it as well
+        self.search_path = search_path
+        self.database = Database()
+
+
 def load_database_file(
     filename: Path | str,
     macros: dict[str, str] | None = None,
-    search_path: set[Path] | None = None,
+    search_path: set[Path] | frozenset[Path] | None = None,
     load_includes_strategy: LoadIncludesStrategy = LoadIncludesStrategy.LOAD_INTO_SELF,
     allow_unmatched_macros: bool = True,
+    file_texts: dict[Path, str] | None = None,
 ) -> Database:
     """
     :param str filename: EPICS database filename
+    :param dict file_texts: texts of files read earlier, reused instead of reading
+        them again; files read by this load are added to it
     :return: list of record dict
     :rtype: list of dicts
     """
-
     filename = find_database_file(filename, search_path)
 
-    database = Database()
-
-    # read line by line and expand macros
-    lineno = 1
-    lines = []
-    failed = False
-    with open(filename) as fp:
-        for line in fp.readlines():
-            if macros is not None:
-                expanded, unmatched = macro_expand(line, macros)
-                if unmatched:
-                    msg = f"{filename}:{lineno}: macro(s) {unmatched} undefined"
-                    if not allow_unmatched_macros:
-                        failed = True
-                        logger.error(msg)
-                    else:
-                        logger.debug(msg)
-                else:
-                    lines.append(expanded)
+    # Includes are loaded using an explicit stack of files instead of recursion.
+    # A file is attached to its parent as soon as it is finished, before the
+    # parent continues, so the order records are merged in is unchanged.
+    # Files finished during this load are kept aside as well, keyed by file and
+    # the search path its includes are resolved against, so a file included
+    # from several places is parsed once.
+    loaded: dict[tuple, Database] = {}
+    stack = [
+        _open_database_file(
+            filename,
+            (filename, frozenset(search_path or ())),
+            None,
+            macros,
+            search_path,
+            allow_unmatched_macros,
+            file_texts,
+        )
+    ]
+    while True:
+        frame = stack[-1]
+        inclusion = _parse_until_include(frame, load_includes_strategy)
+        if inclusion is not None:
+            included_file = find_database_file(Path(inclusion), frame.search_path)
+            if any(parent.filename == included_file for parent in stack):
+                raise DatabaseException(
+                    f"Circular include of '{included_file}' in '{frame.filename}'"
+                )
+            key = (included_file, frame.search_path)
+            if key in loaded:
+                _add_included_database(
+                    frame,
+                    inclusion,
+                    loaded[key].copy(deep=True),
+                    load_includes_strategy,
+                )
             else:
-                lines.append(line)
-            lineno += 1
+                stack.append(
+                    _open_database_file(
+                        included_file,
+                        key,
+                        inclusion,
+                        macros,
+                        frame.search_path,
+                        allow_unmatched_macros,
+                        file_texts,
+                    )
+                )
+            continue
 
-    if failed:
-        raise DatabaseException(
-            f"Failed to load database file '{filename}' due to undefined macros"
+        stack.pop()
+        logger.info(
+            "Loaded %d unique records from '%s'", len(frame.database), frame.filename
+        )
+        if frame.inclusion is None:
+            return frame.database
+
+        loaded[frame.key] = frame.database
+        # Included records are merged by reference, so never hand out the kept ones
+        _add_included_database(
+            stack[-1],
+            frame.inclusion,
+            frame.database.copy(deep=True),
+            load_includes_strategy,
         )
 
-    # parse record instances
-    src = iter(Tokenizer(StringIO("".join(lines)), str(filename)))
-    while True:
-        try:
-            token = next(src)
-        except StopIteration:
-            break
 
+def _open_database_file(
+    filename: Path,
+    key: tuple,
+    inclusion: str | None,
+    macros: dict[str, str] | None,
+    search_path: set[Path] | frozenset[Path] | None,
+    allow_unmatched_macros: bool,
+    file_texts: dict[Path, str] | None,
+) -> _DatabaseFileFrame:
+    if file_texts is None:
+        text = read_database_file(filename)
+    else:
+        text = file_texts.get(filename)
+        if text is None:
+            text = file_texts[filename] = read_database_file(filename)
+
+    # expand macros over the whole file in one pass
+    if macros is not None:
+        text, unmatched = macro_expand(text, macros)
+        if unmatched and not allow_unmatched_macros:
+            for lineno, names in find_unmatched_macros(text).items():
+                logger.error("%s:%d: macro(s) %s undefined", filename, lineno, names)
+            raise DatabaseException(
+                f"Failed to load database file '{filename}' due to undefined macros"
+            )
+        elif unmatched and logger.isEnabledFor(logging.DEBUG):
+            # Locating the leftover macros is only worth it if it gets reported
+            for lineno, names in find_unmatched_macros(text).items():
+                logger.debug("%s:%d: macro(s) %s undefined", filename, lineno, names)
+
+    return _DatabaseFileFrame(
+        filename,
+        key,
+        inclusion,
+        iter(Tokenizer(text, str(filename))),
+        # A new frozenset, so the caller's search path is never modified
+        frozenset(search_path or ()) | {filename.parent},
+    )
+
+
+def _parse_until_include(
+    frame: _DatabaseFileFrame, load_includes_strategy: LoadIncludesStrategy
+) -> str | None:
+    """
+    Parse record instances until an include that should be loaded is reached.
+
+    :return: the included filename, or None once the whole file has been parsed
+    """
+    database = frame.database
+    # parse_record/parse_pair consume from the same iterator as this loop
+    src = frame.src
+    for token in src:
         if token == "record" or token == "grecord":
             database.add_record(parse_record(src))
         elif token == "alias":
@@ -305,42 +507,36 @@ def load_database_file(
             if record_name is None or alias_name is None:
                 logger.error("Failed to parse record alias")
             else:
-                logger.debug(f"Adding alias '{alias_name}' for record '{record_name}'")
+                logger.debug(
+                    "Adding alias '%s' for record '%s'", alias_name, record_name
+                )
                 database[record_name].aliases.append(alias_name)
         elif token == "include":
             inclusion = next(src)
             # Add placeholder entry for included file even if we don't end up loading it
             database.add_included_template(inclusion, None)
-
-            # recursively load included file
             if load_includes_strategy != LoadIncludesStrategy.IGNORE:
-                extended_search_path = search_path if search_path else set()
-                extended_search_path.add(filename.parent)
-                included_db = load_database_file(
-                    Path(inclusion),
-                    macros,
-                    extended_search_path,
-                    load_includes_strategy,
-                    allow_unmatched_macros,
-                )
-                if load_includes_strategy == LoadIncludesStrategy.LOAD_INTO_SELF:
-                    logger.debug(
-                        f"Merging database from '{inclusion}' into '{filename}'"
-                    )
-                    database.merge(included_db)
-                elif load_includes_strategy == LoadIncludesStrategy.LOAD_INTO_NEW:
-                    logger.debug(
-                        f"Adding database from '{inclusion}' as a separate template"
-                    )
-                    database.add_included_template(inclusion, included_db)
+                return inclusion
         else:
             raise DatabaseException(
                 "Invalid token encountered while parsing database file"
             )
 
-    logger.info(f"Loaded {len(database)} unique records from '{filename}'")
-
-    return database
+    return None
+
+
+def _add_included_database(
+    frame: _DatabaseFileFrame,
+    inclusion: str,
+    included_db: Database,
+    load_includes_strategy: LoadIncludesStrategy,
+) -> None:
+    if load_includes_strategy == LoadIncludesStrategy.LOAD_INTO_SELF:
+        logger.debug("Merging database from '%s' into '%s'", inclusion, frame.filename)
+        frame.database.merge(included_db)
+    elif load_includes_strategy == LoadIncludesStrategy.LOAD_INTO_NEW:
+        logger.debug("Adding database from '%s' as a separate template", inclusion)
+        frame.database.add_included_template(inclusion, included_db)
 
 
 if __name__ == "__main__":
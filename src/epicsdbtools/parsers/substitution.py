@@ -1,10 +1,13 @@
 from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from io import StringIO
+from itertools import repeat
 from pathlib import Path
 
 from ..tokenizer import Tokenizer
+from .database import Database, load_database_file
 
 
 def parse_filename(src: Iterator[str]) -> Path | None:
@@ -21,36 +24,28 @@ def parse_filename(src: Iterator[str]) -> Path | None:
     return Path(filename) if filename else None
 
 
-def parse_pattern_macros(src: Iterator[str]) -> list[str]:
-    macros = []
+def _parse_list(src: Iterator[str]) -> list[str]:
+    """
+    parse a comma separated '{a, b, c}' list, after its opening brace
+    """
+    items = []
 
     token = next(src)
-    while True:
-        if token == "}":
-            break
-
+    while token != "}":
         if token != ",":
-            macros.append(token)
+            items.append(token)
 
         token = next(src)
 
-    return macros
+    return items
 
 
-def parse_pattern_values(src: Iterator[str]) -> list[str]:
-    values = []
-
-    token = next(src)
-    while True:
-        if token == "}":
-            break
-
-        if token != ",":
-            values.append(token)
+def parse_pattern_macros(src: Iterator[str]) -> list[str]:
+    return _parse_list(src)
 
-        token = next(src)
 
-    return values
+def parse_pattern_values(src: Iterator[str]) -> list[str]:
+    return _parse_list(src)
 
 
 def parse_macro_value(src: Iterator[str]) -> tuple[list[str], list[str]]:
@@ -93,7 +88,7 @@ class Substitution:
     macros: dict[str, str]
 
 
-def parse_substitution(source: StringIO) -> list[Substitution]:
+def parse_substitution(source: StringIO | str) -> list[Substitution]:
     """
     :param buffer source: EPICS substitutes
     :return: list of (filename, macros, values)
@@ -133,9 +128,7 @@ def parse_substitution(source: StringIO) -> list[Substitution]:
                             macros, values = parse_macro_value(src)
                         else:
                             macros, values = pattern_macros, parse_pattern_values(src)
-                        d = {}
-                        d.update(global_macros)
-                        d.update(file_global_macros)
+                        d = global_macros | file_global_macros
                         d.update(zip(macros, values, strict=False))
                         if file_path is None:
                             raise ValueError("File path could not be determined")
@@ -161,16 +154,58 @@ def parse_substitution(source: StringIO) -> list[Substitution]:
 
 
 def load_substitution_file(filename):
+    # The tokenizer takes the text directly, no StringIO copy needed
     with open(filename) as fp:
-        return parse_substitution(StringIO(fp.read()))
+        return parse_substitution(fp.read())
+
+
+def _load_substitution_database(
+    substitution: Substitution, search_path: set[Path] | None
+) -> Database:
+    return load_database_file(substitution.file, substitution.macros, search_path)
+
+
+def load_substitution_databases(
+    substitutions: list[Substitution],
+    search_path: set[Path] | None = None,
+    max_workers: int | None = None,
+) -> Database:
+    """
+    Load the database of every substitution and merge them, in order, into one.
+
+    Substitution files commonly instantiate one template many times, so each file
+    is only read once per call. Every template instance is still tokenized and
+    parsed independently, so with max_workers greater than one the work is spread
+    over a pool of that many worker processes. Starting the pool only pays off for
+    large substitution files, as each worker reads its templates from scratch.
+    """
+    db = Database()
+    if max_workers is None or max_workers < 2 or len(substitutions) < 2:
+        file_texts: dict[Path, str] = {}
+        for substitution in substitutions:
+            db.merge(
+                load_database_file(
+                    substitution.file,
+                    substitution.macros,
+                    search_path,
+                    file_texts=file_texts,
+                )
+            )
+        return db
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        loaded = executor.map(
+            _load_substitution_database, substitutions, repeat(search_path)
+        )
+        for database in loaded:
+            db.merge(database)
+    return db
 
 
 if __name__ == "__main__":
     import argparse
     import os
 
-    from .database import Database, load_database_file
-
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "-I", action="append", dest="includes", help="substitution include paths"
@@ -184,13 +219,7 @@ if __name__ == "__main__":
             includes = {Path(subs_file).parent}
             if args.includes:
                 includes.update([Path(i) for i in args.includes])
-            for substitution in load_substitution_file(subs_file):
-                db.update(
-                    load_database_file(
-                        Path(substitution.file),
-                        substitution.macros,
-                        includes,
-                        args.encoding,
-                    )
-                )
+            db.merge(
+                load_substitution_databases(load_substitution_file(subs_file), includes)
+            )
     print(db)
@@ -1,6 +1,7 @@
 import re
 from collections.abc import Iterator
 from io import StringIO
+from re import Pattern
 
 __all__ = ["Tokenizer"]
 
@@ -10,12 +11,20 @@ def group(*choices) -> str:
     return "(" + "|".join(choices) + ")"
 
 
-Whitespace = r"(?P<whitespace>[ \f\t]*)"
-Comment = r"(?P<comment>#[^\r\n]*)"
+Whitespace = r"\s*"
+Comment = r"#[^\r\n]*"
 Special = "[,={}()]"
 Bareword = r"[a-zA-Z0-9_\-+:./\\\[\]<>]+"
-QuotedString = group(r"'[^\n'\\]*(?:\\.[^\n'\\]*)*'", r'"[^\n"\\]*(?:\\.[^\n"\\]*)*"')
-Token = group(Comment, Special, Bareword, QuotedString, Whitespace)
+QuotedString = r"'[^\n'\\]*(?:\\.[^\n'\\]*)*'|" + r'"[^\n"\\]*(?:\\.[^\n"\\]*)*"'
+Token = group(Special, Bareword, QuotedString)
+# Each match consumes leading whitespace followed by a comment or a token. The
+# token is the only capturing group, so findall() yields it ('' for comments).
+TOKEN_REGEX: Pattern = re.compile(Whitespace + "(?:" + Comment + "|" + Token + ")")
+# Matches the longest prefix made up of valid tokens. The repetition is possessive
+# so invalid input cannot backtrack through every way of splitting barewords.
+VALID_REGEX: Pattern = re.compile("(?:" + TOKEN_REGEX.pattern + ")*+" + Whitespace)
+
+QUOTE_CHARS = frozenset("\"'")
 
 
 class TokenException(Exception):
@@ -37,17 +46,15 @@ class Tokenizer:
     >>> for t in Tokenizer(io):
     ...     print(t, end=' ')
     bareword $(NAME=VALUE) name = value  { name }
-    >>> for t in Tokenizer(StringIO('# this is a comment line')):
+    >>> for t in Tokenizer('# this is a comment line'):
     ...     print(t, end=' ')
     """
 
-    def __init__(self, instream: StringIO, filename: str | None = None):
+    def __init__(self, instream: StringIO | str, filename: str | None = None):
         self.instream = instream
         if filename is None:
-            if hasattr(self.instream, "name"):
-                self.filename = self.instream.name
-            else:
-                self.filename = "<...>"
+            # Plain strings have no name, and neither do most StringIO streams
+            self.filename = getattr(instream, "name", "<...>")
         else:
             self.filename = filename
         self.lineno = 1
@@ -56,42 +63,32 @@ class Tokenizer:
         return self.get_token()
 
     def get_token(self) -> Iterator[str]:
-        self.lineno = 1
-        for line in self.instream:
-            if not line:
-                break
-            self.lineno += 1
-
-            line = line.strip()
-            if line.startswith("#"):
-                continue
-
-            pos, max = 0, len(line)
-            while pos < max:
-                m = re.compile(Token).match(line, pos)
-                if m is not None:
-                    if m.start() == m.end():
-                        raise TokenException(
-                            f'Illegal char "{line[pos]}"',
-                            self.filename,
-                            self.lineno,
-                            pos,
-                            line,
-                        )
-                    pos = m.end()
-                    token = m.group(0)
-                    if not m.group("whitespace") and not m.group("comment"):
-                        if token[0] == token[-1] == '"':
-                            yield token[1:-1]
-                        elif token[0] == token[-1] == "'":
-                            yield token[1:-1]
-                        else:
-                            yield token
-                else:
-                    raise TokenException(
-                        f'Illegal char "{line[pos]}"',
-                        self.filename,
-                        self.lineno,
-                        pos,
-                        line,
-                    )
+        # Plain strings are tokenized directly, avoiding a copy into a StringIO
+        if isinstance(self.instream, str):
+            text = self.instream
+        else:
+            text = self.instream.read()
+
+        # Validate the whole input up front, so the tokens can then be pulled out
+        # by a single findall() in C rather than matched one at a time
+        valid = VALID_REGEX.match(text)
+        pos = valid.end() if valid else 0
+        if pos != len(text):
+            self.lineno = text.count("\n", 0, pos) + 1
+            line_start = text.rfind("\n", 0, pos) + 1
+            line_end = text.find("\n", pos)
+            raise TokenException(
+                f'Illegal char "{text[pos]}"',
+                self.filename,
+                self.lineno,
+                pos - line_start,
+                text[line_start:line_end] if line_end != -1 else text[line_start:],
+            )
+
+        for token in TOKEN_REGEX.findall(text):
+            if not token:
+                continue  # comment
+            elif token[0] in QUOTE_CHARS:
+                yield token[1:-1]
+            else:
+                yield token
@@ -5,8 +5,9 @@ Compare EPICS database configured values against actual IOC values.
 """
 
 import argparse
+import math
 import os
-import re
+import sys
 from pathlib import Path
 
 try:
@@ -14,7 +15,21 @@ try:
 except ImportError:
     CaChannel = None
 
-from epicsdbtools import Database, load_database_file, load_substitution_file
+from epicsdbtools import load_substitution_databases, load_substitution_file
+
+# Fields holding links, whose values may carry NPP/NMS options
+LINK_FIELDS = frozenset(
+    {"SDIS", "FLNK", "SIOL", "SIML", "RDBL", "RLNK", "DINP", "RINP", "STOO"}
+    | {"NVL", "SELL", "DOL", "OUT", "INP"}
+    | {f"DOL{n}" for n in "0123456789"}
+    | {f"LNK{n}" for n in "123456789A"}
+    | {f"{link}{n}" for link in ("OUT", "INP") for n in "ABCDEFGHIJKLMNOPQRSTU"}
+    | {f"IN{n}{n}" for n in "ABCDEFGHIJKL"}
+)
+# Fields holding calc expressions
+CALC_FIELDS = frozenset({"CALC", "OCAL"} | {f"CLC{n}" for n in "ABCDEFGHIJKLMNOP"})
+# Link options that are not significant when comparing links
+IGNORED_LINK_OPTIONS = frozenset({"NPP", "NMS"})
 
 
 class TablePrinter:
@@ -29,12 +44,21 @@ class TablePrinter:
 
         self.formatter = formatter.rstrip()
         self.widths = widths
+        self._format = (self.formatter + "\n").format
+        self._separator = " ".join(["-" * w for w in widths]) + "\n"
 
     def print_line(self, *args):
-        print(self.formatter.format(*args))
+        sys.stdout.write(self._format(*args))
 
     def print_separator(self):
-        print(" ".join(["-" * w for w in self.widths]))
+        sys.stdout.write(self._separator)
+
+
+def normalize_link(link: str) -> str:
+    """
+    Drop NPP/NMS options from a link and collapse the whitespace between its parts.
+    """
+    return " ".join(part for part in link.split() if part not in IGNORED_LINK_OPTIONS)
 
 
 def add_parser_args(parser: argparse.ArgumentParser):
@@ -52,73 +76,81 @@ def main(args: argparse.Namespace | None = None):
         raise RuntimeError("Required CaChannel module not found!")
 
     if args.rtyps:
-        rtyps = args.rtyps.split(",")
+        rtyps = frozenset(args.rtyps.split(","))
     else:
         rtyps = None
 
     subs = os.path.expanduser(args.subs)
 
-    db = Database()
-    for filename, macros in load_substitution_file(subs):
-        db.update(load_database_file(Path(filename), macros, {Path(subs).parent}))
-
-    # print output as table
-    printer = TablePrinter(30, 15, 15)
-    printer.print_line("channel", "IOC", "database")
-    printer.print_separator()
+    # Load in this process; forking after CaChannel is imported is not worth it
+    db = load_substitution_databases(
+        load_substitution_file(subs), {Path(subs).parent}, max_workers=1
+    )
 
+    # issue connect requests for all records, and wait for all of them at once
+    record_chans = []
     for record in db.values():
-        if rtyps and record.rtyp not in rtyps:
+        if rtyps and record.rtype not in rtyps:
             continue
 
-        # issue connect requests and wait for connection
+        name = record.name
         chans = {}
-        for field in record.fields:
-            chan = CaChannel.CaChannel(record.name + "." + field)
+        for field, config_value in record.fields.items():
+            # fields with empty config values are not compared, so not even read
+            if config_value == "":
+                continue
+            chan = CaChannel.CaChannel(f"{name}.{field}")
             chan.search()
             chans[field] = chan
-        CaChannel.ca.pend_io(10)
+        record_chans.append((record, chans))
+    CaChannel.ca.pend_io(10)
+
+    # issue read requests for all channels and wait for completion, keeping the
+    # field type of each channel for the comparison
+    dbf_type_to_DBR_CTRL = CaChannel.ca.dbf_type_to_DBR_CTRL
+    record_reads = []
+    for record, chans in record_chans:
+        reads = {}
+        for field, chan in chans.items():
+            ftype = chan.field_type()
+            chan.array_get(dbf_type_to_DBR_CTRL(ftype))
+            reads[field] = (chan, ftype)
+        record_reads.append((record, reads))
+    CaChannel.ca.pend_io(10)
+
+    # print output as table
+    printer = TablePrinter(30, 15, 15)
+    printer.print_line("channel", "IOC", "database")
+    printer.print_separator()
 
-        # issue read requests and wait for completion
-        for chan in chans.values():
-            chan.array_get(CaChannel.ca.dbf_type_to_DBR_CTRL(chan.field_type()))
-        CaChannel.ca.pend_io(10)
+    print_line = printer.print_line
+    DBF_STRING = CaChannel.ca.DBF_STRING
+    DBF_ENUM = CaChannel.ca.DBF_ENUM
+    for record, reads in record_reads:
+        fields = record.fields
+        is_calc_record = record.rtype in ("calc", "calcout")
 
         # compare and print
         all_consistent = True
-        for field, chan in chans.items():
+        for field, (chan, ftype) in reads.items():
             # get configured value
-            config_value = record.fields[field]
-            # skip those with empty config values
-            if config_value == "":
-                continue
+            config_value = fields[field]
 
             # dbr is a dict containing the channel information
             dbr = chan.getValue()
             actual_value = dbr["pv_value"]
 
             # convert actual or config value for comparison if necessary
-            ftype = chan.field_type()
-            if ftype == CaChannel.ca.DBF_STRING:
+            if ftype == DBF_STRING:
                 # remove "NPP" "NMS" from known link fields
-                if re.match(
-                    r"SDIS|FLNK|SIOL|SIML|RDBL|RLNK|DINP|RINP|STOO|NVL|SELL|DOL\d?|LNK[1-9A]|OUT[A-U]?|INP[A-U]?|IN([A-L])\1",
-                    field,
-                ):
-                    actual_value = re.sub(
-                        " +", " ", re.sub(" +(NPP|NMS)", "", actual_value)
-                    ).strip()
-                    config_value = re.sub(
-                        " +", " ", re.sub(" +(NPP|NMS)", "", config_value)
-                    ).strip()
+                if field in LINK_FIELDS:
+                    actual_value = normalize_link(actual_value)
+                    config_value = normalize_link(config_value)
                 # capitialize calc expressions
-                elif re.match(r"(CALC|OCAL|CLC[A-P])", field) and record.rtyp in [
-                    "calc",
-                    "calcout",
-                ]:
+                elif is_calc_record and field in CALC_FIELDS:
                     config_value = config_value.upper()
                     actual_value = actual_value.upper()
-            elif ftype == CaChannel.ca.DBF_ENUM:
+            elif ftype == DBF_ENUM:
                 # convert the actual value to the same string as the configured value
                 if not config_value.isdigit():
                     if actual_value < len(dbr["pv_statestrings"]):
@@ -126,18 +158,20 @@ def main(args: argparse.Namespace | None = None):
                 else:
                     config_value = int(config_value)
             else:
-                # convert to float for all other numeric types
+                # convert to float for all other numeric types, and compare scalar
+                # values within an absolute tolerance
                 config_value = float(config_value)
-
-            if isinstance(config_value, float) and (
-                isinstance(actual_value, float) or isinstance(actual_value, int)
-            ):
-                if abs(actual_value - config_value) > 1e-9:
-                    all_consistent = False
-                    printer.print_line(chan.name(), actual_value, record.fields[field])
-            elif actual_value != config_value:
+                if isinstance(actual_value, (float, int)):
+                    if not math.isclose(
+                        actual_value, config_value, rel_tol=0.0, abs_tol=1e-9
+                    ):
+                        all_consistent = False
+                        print_line(chan.name(), actual_value, fields[field])
+                    continue
+
+            if actual_value != config_value:
                 all_consistent = False
-                printer.print_line(chan.name(), actual_value, record.fields[field])
+                print_line(chan.name(), actual_value, fields[field])
 
         if not all_consistent:
             printer.print_separator()
@@ -5,12 +5,17 @@ Generate asyn parameter definitions from EPICS DB template.
 """
 
 import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
+from itertools import repeat
 from pathlib import Path
 
 from .. import Database, LoadIncludesStrategy, load_database_file
-from ..log import logger
+from ..log import logger, set_log_level
 
 
 class ParamType(Enum):
@@ -21,6 +26,19 @@ class ParamType(Enum):
     UINTDIGITAL = "asynUInt32Digital"
 
 
+# Lookup table to avoid going through the Enum constructor for every record
+DTYP_TO_PARAM_TYPE: dict[str, ParamType] = {ptype.value: ptype for ptype in ParamType}
+
+# asyn parameter type passed to createParam() for each device type
+PARAM_TYPE_TO_INTERNAL: dict[ParamType, str] = {
+    ParamType.INT: "asynParamInt32",
+    ParamType.DOUBLE: "asynParamFloat64",
+    ParamType.STRINGIN: "asynParamOctet",
+    ParamType.STRINGOUT: "asynParamOctet",
+    ParamType.UINTDIGITAL: "asynParamUInt32Digital",
+}
+
+
 @dataclass(frozen=True)
 class ParamDef:
     record_str: str
@@ -29,42 +47,59 @@ class ParamDef:
 
 
 def get_internal_param_type_from_dtyp(dtyp: ParamType) -> str:
-    if dtyp in [ParamType.STRINGIN, ParamType.STRINGOUT]:
-        return "asynParamOctet"
-    else:
-        return "asynParam" + dtyp.value.split("asyn")[-1]
+    return PARAM_TYPE_TO_INTERNAL[dtyp]
 
 
 def get_params_from_db(
     database: Database, base_name: str, prefix: str | None = None
 ) -> list[ParamDef]:
     params = {}
+    # Readback and setpoint records commonly share the same param string
+    param_strings: set[str] = set()
+    # Checked once rather than for each param
+    debug = logger.isEnabledFor(logging.DEBUG)
     for record in database.values():
-        for field_name in ["OUT", "INP"]:
-            if field_name in record.fields:
-                param_string = str(record.fields[field_name]).rsplit(")", 1)[-1]
+        fields = record.fields
+        for field_name in ("OUT", "INP"):
+            link = fields.get(field_name)
+            if link is not None:
+                param_string = str(link).rsplit(")", 1)[-1]
                 if prefix is not None and not param_string.startswith(prefix):
                     logger.info(
-                        f"Skipping {param_string} as it does not start with {prefix}"
+                        "Skipping %s as it does not start with %s", param_string, prefix
                     )
                     continue
+                if param_string in param_strings:
+                    if debug:
+                        logger.debug(
+                            "Param %s already defined, skipping duplicate.",
+                            param_string,
+                        )
+                    continue
 
-                param_suffix = "".join(
-                    [p.lower().capitalize() for p in param_string.split("_")[1:]]
-                )
+                dtyp = str(fields.get("DTYP"))
+                param_type = DTYP_TO_PARAM_TYPE.get(dtyp)
+                if param_type is None:
+                    logger.warning(
+                        "Skipping param %s in record '%s' with unsupported DTYP '%s'",
+                        param_string,
+                        record.name,
+                        dtyp,
+                    )
+                    continue
+                param_strings.add(param_string)
+
+                param_suffix = "".join(map(str.capitalize, param_string.split("_")[1:]))
                 param_name = f"{base_name}_{param_suffix}"
                 if param_name not in params:
-                    logger.debug(
-                        f"Found param: {param_string} of type {record.fields['DTYP']}"
-                    )
+                    if debug:
+                        logger.debug("Found param: %s of type %s", param_string, dtyp)
                     params[param_name] = ParamDef(
-                        record_str=param_string,
-                        name=param_name,
-                        type=ParamType(record.fields["DTYP"]),
+                        record_str=param_string, name=param_name, type=param_type
                     )
-                else:
+                elif debug:
                     logger.debug(
-                        f"Param {param_name} already defined, skipping duplicate."
+                        "Param %s already defined, skipping duplicate.", param_name
                     )
     return list(params.values())
 
@@ -73,53 +108,94 @@ def generate_header_file_for_db(
     params: list[ParamDef], output_path: Path, driver_name: str, base_name: str
 ):
     header_file = output_path / f"{driver_name}ParamDefs.h"
-    logger.info(f"Generating header file {header_file} for {len(params)} params")
-
-    with open(header_file, "w") as hf:
-        hf.write(f"#ifndef {base_name.upper()}_PARAM_DEFS_H\n")
-        hf.write(f"#define {base_name.upper()}_PARAM_DEFS_H\n\n")
-        hf.write("// This file is auto-generated. Do not edit directly.\n")
-        hf.write(f"// Generated from {driver_name}.template\n\n")
+    logger.info("Generating header file %s for %d params", header_file, len(params))
 
-        hf.write("// String definitions for parameters\n")
-        for param in params:
+    macro_base = base_name.upper()
+    lines = [
+        f"#ifndef {macro_base}_PARAM_DEFS_H\n",
+        f"#define {macro_base}_PARAM_DEFS_H\n\n",
+        "// This file is auto-generated. Do not edit directly.\n",
+        f"// Generated from {driver_name}.template\n\n",
+        "// String definitions for parameters\n",
+    ]
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for param in params:
+        if debug:
             logger.debug("Defining string for param: %s", param.name)
-            hf.write(f'#define {param.name}String "{param.record_str}"\n')
-        hf.write("\n")
+        lines.append(f'#define {param.name}String "{param.record_str}"\n')
+    lines.append("\n")
 
-        hf.write("// Parameter index definitions\n")
-        for param in params:
+    lines.append("// Parameter index definitions\n")
+    for param in params:
+        if debug:
             logger.debug("Defining index for param: %s", param.name)
-            hf.write(f"int {param.name};\n")
+        lines.append(f"int {param.name};\n")
 
-        if len(params) > 0:
-            hf.write(
-                f"\n#define {base_name.upper()}_FIRST_PARAM {list(params)[0].name}\n"
-            )
-            hf.write(
-                f"#define {base_name.upper()}_LAST_PARAM {list(params)[-1].name}\n\n"
-            )
-        hf.write(f"#define NUM_{base_name.upper()}_PARAMS {len(params)}\n\n")
-        hf.write("#endif\n")
+    if len(params) > 0:
+        lines.append(f"\n#define {macro_base}_FIRST_PARAM {params[0].name}\n")
+        lines.append(f"#define {macro_base}_LAST_PARAM {params[-1].name}\n\n")
+    lines.append(f"#define NUM_{macro_base}_PARAMS {len(params)}\n\n")
+    lines.append("#endif\n")
+
+    # Write everything at once rather than issuing many small writes
+    with open(header_file, "w") as hf:
+        hf.write("".join(lines))
 
 
 def generate_cpp_file_for_db(
     params: list[ParamDef], output_path: Path, driver_name: str
 ):
     cpp_file = output_path / f"{driver_name}ParamDefs.cpp"
-    logger.info(f"Generating cpp file {cpp_file} for {len(params)} params")
+    logger.info("Generating cpp file %s for %d params", cpp_file, len(params))
+
+    lines = [
+        "// This file is auto-generated. Do not edit directly.\n",
+        f"// Generated from {driver_name}.template\n\n",
+        f'#include "{driver_name}.h"\n\n',
+        f"void {driver_name}::createAllParams() {{\n",
+    ]
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for param in params:
+        if debug:
+            logger.debug("Creating param: %s", param.name)
+        lines.append(
+            f"    createParam({param.name}String, {PARAM_TYPE_TO_INTERNAL[param.type]}, &{param.name});\n"  # noqa E501
+        )
+    lines.append("}\n")
 
     with open(cpp_file, "w") as cf:
-        cf.write("// This file is auto-generated. Do not edit directly.\n")
-        cf.write(f"// Generated from {driver_name}.template\n\n")
-        cf.write(f'#include "{driver_name}.h"\n\n')
-        cf.write(f"void {driver_name}::createAllParams() {{\n")
+        cf.write("".join(lines))
+
+
+def generate_param_defs_for_template(
+    template_file: Path,
+    output_path: Path,
+    filename: str | None = None,
+    prefix: str | None = None,
+    use_prefix_as_base: bool = False,
+):
+    driver_name = filename if filename else template_file.stem
+    if not use_prefix_as_base:
+        base_name = driver_name
+    elif prefix:
+        base_name = prefix
+    else:
+        raise ValueError("A prefix is required to use it as the base name")
+
+    database = load_database_file(
+        template_file, load_includes_strategy=LoadIncludesStrategy.IGNORE
+    )
+    params = get_params_from_db(database, base_name, prefix=prefix)
+    if logger.isEnabledFor(logging.INFO):
         for param in params:
-            logger.debug(f"Creating param: {param.name}")
-            cf.write(
-                f"    createParam({param.name}String, {get_internal_param_type_from_dtyp(param.type)}, &{param.name});\n"  # noqa E501
+            logger.info(
+                "Param: %s, Type: %s, Record: %s",
+                param.name,
+                param.type,
+                param.record_str,
             )
-        cf.write("}\n")
+    generate_header_file_for_db(params, output_path, driver_name, base_name)
+    generate_cpp_file_for_db(params, output_path, driver_name)
 
 
 def add_parser_args(parser: argparse.ArgumentParser):
@@ -144,6 +220,13 @@ def add_parser_args(parser: argparse.ArgumentParser):
         action="store_true",
         help="Use the prefix as the base name for generated files.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to generate a directory of templates.",
+    )
 
 
 def main(args: argparse.Namespace | None = None):
@@ -151,30 +234,56 @@ def main(args: argparse.Namespace | None = None):
         parser = argparse.ArgumentParser(description=__doc__)
         add_parser_args(parser)
         args = parser.parse_args()
-        main(args)
+
+    if args.use_prefix_as_base and not args.prefix:
+        logger.error("--use-prefix-as-base requires --prefix")
+        sys.exit(1)
 
     in_path = Path(args.input_path)
     out_path = Path(args.output_path)
 
+    # scandir entries know their type from the directory listing, avoiding a
+    # stat() per file; check the cheap name suffix first
     template_files = (
         [in_path]
         if in_path.is_file()
-        else [f for f in in_path.iterdir() if f.is_file() and f.suffix == ".template"]
+        else [
+            Path(entry.path)
+            for entry in os.scandir(in_path)
+            if entry.name.endswith(".template") and entry.is_file()
+        ]
     )
-    for template_file in template_files:
-        driver_name = args.filename if args.filename else template_file.stem
-        base_name = driver_name if not args.use_prefix_as_base else args.prefix
+    if args.jobs < 2 or len(template_files) < 2:
+        for template_file in template_files:
+            generate_param_defs_for_template(
+                template_file,
+                out_path,
+                args.filename,
+                args.prefix,
+                args.use_prefix_as_base,
+            )
+        return
 
-        database = load_database_file(
-            template_file, load_includes_strategy=LoadIncludesStrategy.IGNORE
+    if args.filename:
+        # Every template would write the same files, in whichever order they finish
+        logger.error("--filename cannot be used with --jobs for several templates")
+        sys.exit(1)
+
+    # Templates are independent of each other, so parse them in parallel
+    with ProcessPoolExecutor(
+        max_workers=args.jobs, initializer=set_log_level, initargs=(logger.level,)
+    ) as executor:
+        results = executor.map(
+            generate_param_defs_for_template,
+            template_files,
+            repeat(out_path),
+            repeat(args.filename),
+            repeat(args.prefix),
+            repeat(args.use_prefix_as_base),
         )
-        params = get_params_from_db(database, base_name, prefix=args.prefix)
-        for param in params:
-            logger.info(
-                f"Param: {param.name}, Type: {param.type}, Record: {param.record_str}"
-            )
-        generate_header_file_for_db(params, out_path, driver_name, base_name)
-        generate_cpp_file_for_db(params, out_path, driver_name)
+        # Consume the results, so that errors from the workers are raised here
+        for _ in results:
+            pass
 
 
 if __name__ == "__main__":
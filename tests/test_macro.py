@@ -29,8 +29,26 @@ def test_macro_split(input_string, expected_macros):
         ("$(X) and $(Y=default)", {"X": "valueX"}, ("valueX and default", [])),
         ("$(UNDEF)", {}, ("$(UNDEF)", ["UNDEF"])),
         ("Nested $(A=$(B=2))", {"B": "5"}, ("Nested 5", [])),
+        ("Nested $(A)", {"A": "$(B)", "B": "5"}, ("Nested 5", [])),
+        ("$$(A)", {"A": "(B)", "B": "5"}, ("5", [])),
+        ("$$(A)(B)", {"A": "", "B": "x"}, ("x", [])),
+        ("$$(A=)(B)", {"B": "x"}, ("x", [])),
+        ("$(A)", {"A": "$(A)"}, ("$(A)", [])),
         ("Multiple $(A) and $(A=default)", {}, ("Multiple $(A) and default", ["A"])),
     ],
 )
 def test_macro_expand(input_string, macro_defs, expected_output):
     assert macro_tools.macro_expand(input_string, macro_defs) == expected_output
+
+
+@pytest.mark.parametrize(
+    "input_string, expected_unmatched",
+    [
+        ("", {}),
+        ("No macros here", {}),
+        ("$(A)", {1: ["A"]}),
+        ("$(A)\nno macros\n$(B) $(C)", {1: ["A"], 3: ["B", "C"]}),
+    ],
+)
+def test_find_unmatched_macros(input_string, expected_unmatched):
+    assert macro_tools.find_unmatched_macros(input_string) == expected_unmatched
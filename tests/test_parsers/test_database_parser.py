@@ -3,6 +3,7 @@ import os
 import pytest
 
 from epicsdbtools import Database, Record, RecordType, load_database_file
+from epicsdbtools.parsers import database
 from epicsdbtools.parsers.database import (
     DatabaseException,
     LoadIncludesStrategy,
@@ -71,6 +72,33 @@ def test_merge_records_different_names():
         record1.merge(record2)
 
 
+def test_record_equality_respects_field_order():
+    record1 = Record("testRecord", RecordType.AI)
+    record1.fields["DTYP"] = "asynInt32"
+    record1.fields["SCAN"] = "I/O Intr"
+    record2 = Record("testRecord", RecordType.AI)
+    record2.fields["SCAN"] = "I/O Intr"
+    record2.fields["DTYP"] = "asynInt32"
+    assert record1 != record2
+
+    record2.fields = dict(record1.fields)
+    assert record1 == record2
+
+
+def test_database_copy(sample_asyn_db):
+    sample_asyn_db.add_included_template("included.db", None)
+    copied_db = sample_asyn_db.copy()
+    assert isinstance(copied_db, Database)
+    assert copied_db == sample_asyn_db
+    assert copied_db.get_included_templates() == {"included.db": None}
+
+    copied_db.add_record(Record("additionalRecord", RecordType.AI))
+    assert "additionalRecord" not in sample_asyn_db
+    # Extra records make databases differ whichever side they are on
+    assert copied_db != sample_asyn_db
+    assert sample_asyn_db != copied_db
+
+
 def test_parse_record(tokenizer_factory):
     record_str = """(ai, "testRecord") {
     field(VAL, "42")
@@ -100,6 +128,19 @@ record(invalid, "testRecord") {
         parse_record(iter(tokenizer_factory(record_str)))
 
 
+@pytest.mark.parametrize(
+    "rtype, expected",
+    [("aSub", RecordType.ASUB), ("mbbiDirect", RecordType.MBBIDIRECT), ("asub", None)],
+)
+def test_parse_record_type_lookup(tokenizer_factory, rtype, expected):
+    record_str = f'({rtype}, "testRecord") {{\n}}\n'
+    if expected is None:
+        with pytest.raises(DatabaseException, match="Invalid record type 'asub'"):
+            parse_record(iter(tokenizer_factory(record_str)))
+    else:
+        assert parse_record(iter(tokenizer_factory(record_str))).rtype == expected
+
+
 def test_find_database_file(tmp_path):
     file = tmp_path / "test.db"
     with open(file, "w") as f:
@@ -113,6 +154,28 @@ def test_find_database_file(tmp_path):
         find_database_file("nonexistent.db", search_path={tmp_path})
 
 
+def test_find_database_file_removed_after_lookup(tmp_path):
+    file = tmp_path / "removed.db"
+    file.touch()
+    assert find_database_file("removed.db", search_path={tmp_path}) == file
+
+    file.unlink()
+    with pytest.raises(FileNotFoundError):
+        find_database_file("removed.db", search_path={tmp_path})
+
+
+def test_find_database_file_created_after_lookup(tmp_path):
+    search_dir = tmp_path / "search"
+    search_dir.mkdir()
+    (search_dir / "t.db").touch()
+    os.chdir(tmp_path)
+    assert find_database_file("t.db", search_path={search_dir}) == search_dir / "t.db"
+
+    # A file in the working directory takes precedence once it exists
+    (tmp_path / "t.db").touch()
+    assert find_database_file("t.db", search_path={search_dir}) == tmp_path / "t.db"
+
+
 def test_load_invalid_database_file(tmp_path):
     file = tmp_path / "invalid.db"
     with open(file, "w") as f:
@@ -121,6 +184,12 @@ def test_load_invalid_database_file(tmp_path):
         load_database_file(file)
 
 
+def test_load_empty_database_file(tmp_path):
+    file = tmp_path / "empty.db"
+    file.touch()
+    assert load_database_file(file) == Database()
+
+
 def test_load_database_file_doesnot_exist(tmp_path):
     file = tmp_path / "nonexistent.db"
     with pytest.raises(FileNotFoundError):
@@ -131,13 +200,15 @@ def test_load_database_file(sample_asyn_db, tmp_path):
     file = tmp_path / "test.db"
     with open(file, "w") as f:
         f.write(repr(sample_asyn_db))
-    assert load_database_file(file) == sample_asyn_db
+    loaded_db = load_database_file(file)
+    assert loaded_db == sample_asyn_db
+    assert list(loaded_db.keys()) == list(sample_asyn_db.keys())
 
 
 def test_load_database_file_with_comments(tmp_path, sample_asyn_db):
     file = tmp_path / "test.db"
-    for record in sample_asyn_db.values():
-        with open(file, "w") as f:
+    with open(file, "w") as f:
+        for record in sample_asyn_db.values():
             f.write("# This is a comment\n")
             f.write(repr(record))
     loaded_db = load_database_file(file)
@@ -180,3 +251,192 @@ def test_load_database_file_with_includes(sample_asyn_db, tmp_path):
     expected_db.add_record(addtl_record)
     assert loaded_db == expected_db
     assert loaded_db.get_included_templates() == {"included.db": None}
+
+
+def test_load_database_file_with_macros(tmp_path):
+    file = tmp_path / "test.db"
+    with open(file, "w") as f:
+        f.write('record(ai, "$(P)$(R)") {\n    field(DESC, "$(DESC=default)")\n}\n')
+
+    loaded_db = load_database_file(file, macros={"P": "TEST:", "R": "AI"})
+    assert list(loaded_db.keys()) == ["TEST:AI"]
+    assert loaded_db["TEST:AI"].fields["DESC"] == "default"
+
+    loaded_db = load_database_file(file, macros={"P": "TEST:"})
+    assert list(loaded_db.keys()) == ["TEST:$(R)"]
+
+    with pytest.raises(DatabaseException):
+        load_database_file(file, macros={"P": "TEST:"}, allow_unmatched_macros=False)
+
+
+def test_load_database_file_shares_dtyp_values(tmp_path):
+    file = tmp_path / "test.db"
+    with open(file, "w") as f:
+        f.write('record(ai, "rec0") {\n    field(DTYP, "asynInt32")\n}\n')
+        f.write('record(ai, "rec1") {\n    field(DTYP, "asynInt32")\n}\n')
+
+    loaded_db = load_database_file(file)
+    assert loaded_db["rec0"].fields["DTYP"] is loaded_db["rec1"].fields["DTYP"]
+
+
+def test_load_database_file_sees_modified_include(tmp_path):
+    file = tmp_path / "cached.db"
+    with open(file, "w") as f:
+        f.write('include "included.db"\n')
+        f.write('record(ai, "rec0") {\n    field(DESC, "first")\n}\n')
+    included_file = tmp_path / "included.db"
+    with open(included_file, "w") as f:
+        f.write('record(ai, "rec1") {\n    field(DESC, "first")\n}\n')
+
+    loaded_db = load_database_file(file)
+    loaded_db["rec1"].fields["DESC"] = "modified"
+    # Each load returns a database of its own
+    assert load_database_file(file)["rec1"].fields["DESC"] == "first"
+
+    with open(included_file, "w") as f:
+        f.write('record(ai, "rec1") {\n    field(DESC, "second")\n}\n')
+    # Make sure the modification time differs on coarse grained filesystems
+    mtime_ns = included_file.stat().st_mtime_ns + 1_000_000_000
+    os.utime(included_file, ns=(mtime_ns, mtime_ns))
+    assert load_database_file(file)["rec1"].fields["DESC"] == "second"
+
+
+def test_load_database_file_sees_new_include_candidate(tmp_path, monkeypatch):
+    with open(tmp_path / "top.db", "w") as f:
+        f.write('include "inc.db"\n')
+    for name in ["first", "second"]:
+        (tmp_path / name).mkdir()
+    with open(tmp_path / "second" / "inc.db", "w") as f:
+        f.write('record(ai, "fromSecond") {\n}\n')
+
+    monkeypatch.chdir(tmp_path / "first")
+    search_path = {tmp_path / "second"}
+    assert list(load_database_file(tmp_path / "top.db", search_path=search_path)) == [
+        "fromSecond"
+    ]
+    # Relative includes are found in the working directory first
+    with open(tmp_path / "first" / "inc.db", "w") as f:
+        f.write('record(ai, "fromFirst") {\n}\n')
+    assert list(load_database_file(tmp_path / "top.db", search_path=search_path)) == [
+        "fromFirst"
+    ]
+
+
+def test_load_database_file_with_nested_includes(tmp_path):
+    with open(tmp_path / "top.db", "w") as f:
+        f.write('include "middle.db"\n')
+        f.write('record(ai, "rec") {\n    field(DESC, "top")\n}\n')
+    with open(tmp_path / "middle.db", "w") as f:
+        f.write('record(ai, "middle") {\n}\n')
+        f.write('include "bottom.db"\n')
+        f.write('record(ai, "rec") {\n    field(DESC, "middle")\n}\n')
+    with open(tmp_path / "bottom.db", "w") as f:
+        f.write('record(ai, "rec") {\n    field(DESC, "bottom")\n}\n')
+
+    loaded_db = load_database_file(tmp_path / "top.db")
+    assert list(loaded_db.keys()) == ["middle", "rec"]
+    # Definitions later in the include chain override earlier ones
+    assert loaded_db["rec"].fields["DESC"] == "top"
+
+
+def test_load_database_file_with_circular_includes(tmp_path):
+    with open(tmp_path / "first.db", "w") as f:
+        f.write('include "second.db"\n')
+    with open(tmp_path / "second.db", "w") as f:
+        f.write('include "first.db"\n')
+
+    with pytest.raises(DatabaseException, match="Circular include"):
+        load_database_file(tmp_path / "first.db")
+
+
+def test_load_database_file_reuses_file_texts(tmp_path, monkeypatch):
+    reads = []
+
+    def read_database_file(filename):
+        reads.append(filename.name)
+        return filename.read_text()
+
+    monkeypatch.setattr(database, "read_database_file", read_database_file)
+    file = tmp_path / "template.db"
+    with open(file, "w") as f:
+        f.write('record(ai, "$(P)rec") {\n}\n')
+
+    # Each set of macros needs its own parse, but not its own read
+    file_texts = {}
+    assert list(load_database_file(file, {"P": "A:"}, file_texts=file_texts)) == [
+        "A:rec"
+    ]
+    assert list(load_database_file(file, {"P": "B:"}, file_texts=file_texts)) == [
+        "B:rec"
+    ]
+    assert reads == ["template.db"]
+
+    # Without shared texts every load reads the file again
+    load_database_file(file, {"P": "C:"})
+    assert reads == ["template.db", "template.db"]
+
+
+def test_load_database_file_keeps_search_path(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    with open(templates / "included.db", "w") as f:
+        f.write('record(ai, "included") {\n}\n')
+    with open(tmp_path / "top.db", "w") as f:
+        f.write('include "included.db"\n')
+
+    search_path = {templates}
+    assert list(load_database_file(tmp_path / "top.db", search_path=search_path)) == [
+        "included"
+    ]
+    # The directory of the loaded file is searched without being added here
+    assert search_path == {templates}
+    assert list(
+        load_database_file(tmp_path / "top.db", search_path=frozenset(search_path))
+    ) == ["included"]
+
+
+def test_load_database_file_with_shared_include(tmp_path, monkeypatch):
+    opened = []
+    open_database_file = database._open_database_file
+
+    def counting_open_database_file(filename, *args):
+        opened.append(filename.name)
+        return open_database_file(filename, *args)
+
+    monkeypatch.setattr(database, "_open_database_file", counting_open_database_file)
+    with open(tmp_path / "top.db", "w") as f:
+        f.write('include "left.db"\ninclude "right.db"\n')
+    for name in ["left.db", "right.db"]:
+        with open(tmp_path / name, "w") as f:
+            f.write('include "common.db"\n')
+    with open(tmp_path / "common.db", "w") as f:
+        f.write('record(ai, "common") {\n    field(DESC, "common")\n}\n')
+
+    loaded_db = load_database_file(
+        tmp_path / "top.db", load_includes_strategy=LoadIncludesStrategy.LOAD_INTO_NEW
+    )
+    assert sorted(opened) == ["common.db", "left.db", "right.db", "top.db"]
+    templates = loaded_db.get_included_templates()
+    left_db, right_db = templates["left.db"], templates["right.db"]
+    assert left_db is not None and right_db is not None
+    left = left_db.get_included_templates()["common.db"]
+    right = right_db.get_included_templates()["common.db"]
+    assert left is not None and right is not None
+    # Each include still gets a database of its own
+    assert left == right
+    assert left["common"] is not right["common"]
+
+
+def test_load_database_file_rereads_rewritten_file(tmp_path):
+    file = tmp_path / "resized.db"
+    with open(file, "w") as f:
+        f.write('record(ai, "rec") {\n}\n')
+    load_database_file(file)
+
+    # Rewritten without the modification time changing, as can happen within
+    # the timestamp resolution of some filesystems
+    mtime_ns = file.stat().st_mtime_ns
+    with open(file, "w") as f:
+        f.write('record(ai, "rec") {\n}\nrecord(ai, "other") {\n}\n')
+    os.utime(file, ns=(mtime_ns, mtime_ns))
+    assert list(load_database_file(file)) == ["rec", "other"]
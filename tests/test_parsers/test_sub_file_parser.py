@@ -3,6 +3,7 @@ from pathlib import Path
 
 import pytest
 
+from epicsdbtools.parsers import database
 from epicsdbtools.parsers import substitution as sub_file_parser
 
 
@@ -101,3 +102,31 @@ def test_parse_substitution(
             io.StringIO(example_substitution_file_content)
         )
     )
+
+
+@pytest.mark.parametrize("max_workers", [None, 2])
+def test_load_substitution_databases(max_workers):
+    tests_dir = Path(__file__).parent.parent
+    subs = sub_file_parser.load_substitution_file(tests_dir / "test.subs")
+    db = sub_file_parser.load_substitution_databases(
+        subs, {tests_dir}, max_workers=max_workers
+    )
+    # Records are merged in substitution order, whichever process loaded them
+    assert list(db.keys()) == ["MTEST:AO1", "MTEST:AO2", "MTEST:AO3", "MTEST:AO4"]
+    assert db["MTEST:AO3"].fields["DESC"] == "AAbb"
+    assert db["MTEST:AO4"].fields["DESC"] == "aaBB"
+
+
+def test_load_substitution_databases_reads_templates_once(monkeypatch):
+    reads = []
+    read_database_file = database.read_database_file
+
+    def counting_read_database_file(filename):
+        reads.append(filename.name)
+        return read_database_file(filename)
+
+    monkeypatch.setattr(database, "read_database_file", counting_read_database_file)
+    tests_dir = Path(__file__).parent.parent
+    subs = sub_file_parser.load_substitution_file(tests_dir / "test.subs")
+    assert len(sub_file_parser.load_substitution_databases(subs, {tests_dir})) == 4
+    assert reads == ["test.template"]
@@ -1,23 +1,8 @@
-from io import StringIO
-from pathlib import Path
-
 import pytest
 
 from epicsdbtools import tokenizer
 
 
-@pytest.fixture
-def tokenizer_factory():
-    def _factory(input: Path | str) -> tokenizer.Tokenizer:
-        if isinstance(input, Path):
-            with open(input) as fp:
-                return tokenizer.Tokenizer(StringIO(fp.read()), filename=str(input))
-        else:
-            return tokenizer.Tokenizer(StringIO(input), filename="test_input.txt")
-
-    return _factory
-
-
 def test_tokenizer_mixed_line(tokenizer_factory):
     tokens = list(
         tokenizer_factory('bareword "$(NAME=VALUE)" name=value "" {name} # comments')
@@ -82,8 +67,35 @@ def test_tokenizer_with_epics_record_signature(
             'field(FLNK, "XF:31ID1-ES{S:TEST}TEST")',
             ["field", "(", "FLNK", ",", "XF:31ID1-ES{S:TEST}TEST", ")"],
         ),
+        (
+            'field(DESC, "say \\"hi\\"")',
+            ["field", "(", "DESC", ",", 'say \\"hi\\"', ")"],
+        ),
+        (
+            "field(DESC, 'single quoted')",
+            ["field", "(", "DESC", ",", "single quoted", ")"],
+        ),
     ],
 )
 def test_tokenizer_epics_field_definition(tokenizer_factory, input, expected_tokens):
     tokens = list(tokenizer_factory(input))
     assert tokens == expected_tokens
+
+
+def test_tokenizer_accepts_plain_string(tokenizer_factory):
+    input = 'record(ai, "test") {\n\n    field(VAL, "42")\n}\n\nrecord(ai, "test2")\n'
+    tokens = list(tokenizer.Tokenizer(input, filename="test_input.txt"))
+    assert tokens == list(tokenizer_factory(input))
+    assert tokens[-1] == ")"
+    # Without a filename, plain strings are reported under a placeholder name
+    assert tokenizer.Tokenizer(input).filename == "<...>"
+
+
+def test_tokenizer_illegal_char(tokenizer_factory):
+    input = 'record(ai, "test") {\n    field(VAL, 42) ^\n}\n'
+    with pytest.raises(tokenizer.TokenException) as excinfo:
+        list(tokenizer_factory(input))
+    assert excinfo.value.msg == 'Illegal char "^"'
+    assert excinfo.value.lineno == 2
+    assert excinfo.value.colno == 19
+    assert excinfo.value.line == "    field(VAL, 42) ^"
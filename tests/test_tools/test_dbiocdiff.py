@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+from epicsdbtools.tools.dbiocdiff import (
+    CALC_FIELDS,
+    LINK_FIELDS,
+    TablePrinter,
+    normalize_link,
+)
+
+
+@pytest.mark.parametrize(
+    "fields, pattern",
+    [
+        (
+            LINK_FIELDS,
+            r"SDIS|FLNK|SIOL|SIML|RDBL|RLNK|DINP|RINP|STOO|NVL|SELL|DOL\d?|LNK[1-9A]"
+            r"|OUT[A-U]?|INP[A-U]?|IN([A-L])\1",
+        ),
+        (CALC_FIELDS, r"CALC|OCAL|CLC[A-P]"),
+    ],
+)
+def test_field_sets_match_field_patterns(fields, pattern):
+    candidates = {
+        a + b + c + d
+        for a in "CDFILNORS"
+        for b in "ABCDEFILMNOPTUV"
+        for c in "ABCDEFGHIJKLMNOPSTUVW"
+        for d in ["", *"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+    }
+    expected = {field for field in candidates if re.fullmatch(pattern, field)}
+    assert fields == expected
+
+
+@pytest.mark.parametrize(
+    "link, expected",
+    [
+        ("rec.VAL", "rec.VAL"),
+        ("rec.VAL NPP NMS", "rec.VAL"),
+        ("  rec.VAL   PP  NMS ", "rec.VAL PP"),
+        ("@asyn(PORT, 0)  NPP", "@asyn(PORT, 0)"),
+        ("", ""),
+    ],
+)
+def test_normalize_link(link, expected):
+    assert normalize_link(link) == expected
+
+
+def test_table_printer(capsys):
+    printer = TablePrinter(8, 4, 4)
+    printer.print_line("channel", "IOC", "database")
+    printer.print_separator()
+    printer.print_line("rec.VAL", 1.5, "2")
+    assert capsys.readouterr().out.splitlines() == [
+        "channel  IOC  database",
+        "-------- ---- ----",
+        "rec.VAL  1.5  2   ",
+    ]
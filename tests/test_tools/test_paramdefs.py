@@ -1,12 +1,18 @@
+import argparse
+import logging
 import os
 from pathlib import Path
 
+import pytest
+
+from epicsdbtools import Database, Record, RecordType
 from epicsdbtools.tools.paramdefs import (
     ParamType,
     generate_cpp_file_for_db,
     generate_header_file_for_db,
     get_internal_param_type_from_dtyp,
     get_params_from_db,
+    main,
 )
 
 
@@ -51,6 +57,40 @@ def test_get_params_from_db(sample_asyn_db):
         assert expected_param_names[i] == param.name
 
 
+def test_get_params_from_db_shared_param_string():
+    db = Database()
+    for name, rtype, field_name in [
+        ("Gain", RecordType.AO, "OUT"),
+        ("Gain_RBV", RecordType.AI, "INP"),
+    ]:
+        record = Record(name, rtype)
+        record.fields["DTYP"] = "asynFloat64"
+        record.fields[field_name] = "@asyn($(PORT),0,1)TST_GAIN"
+        db.add_record(record)
+
+    params = get_params_from_db(db, "Test")
+    assert len(params) == 1
+    assert params[0].name == "Test_Gain"
+    assert params[0].record_str == "TST_GAIN"
+    assert params[0].type == ParamType.DOUBLE
+
+
+def test_get_params_from_db_unsupported_dtyp(caplog):
+    db = Database()
+    for name, dtyp in [("Gain", "Soft Channel"), ("Gain_RBV", "asynFloat64")]:
+        record = Record(name, RecordType.AO)
+        record.fields["DTYP"] = dtyp
+        record.fields["OUT"] = "@asyn($(PORT),0,1)TST_GAIN"
+        db.add_record(record)
+
+    with caplog.at_level(logging.WARNING):
+        params = get_params_from_db(db, "Test")
+    assert "unsupported DTYP 'Soft Channel'" in caplog.text
+    # The param string is still picked up from a record with a supported DTYP
+    assert [param.name for param in params] == ["Test_Gain"]
+    assert params[0].type == ParamType.DOUBLE
+
+
 def test_generate_header_and_cpp_files(tmp_path, sample_asyn_db):
     params = get_params_from_db(sample_asyn_db, "Test")
     generate_header_file_for_db(params, tmp_path, "Test", "Test")
@@ -100,3 +140,69 @@ def test_generate_header_file_no_params(tmp_path):
         assert "#define NUM_EMPTYTEST_PARAMS 0" in content
         assert "#define EMPTYTEST_FIRST_PARAM" not in content
         assert "#define EMPTYTEST_LAST_PARAM" not in content
+
+
+def test_main_with_template_directory(tmp_path):
+    for name in ["first", "second"]:
+        with open(tmp_path / f"{name}.template", "w") as f:
+            f.write(f'record(ai, "{name}") {{\n')
+            f.write('    field(DTYP, "asynFloat64")\n')
+            f.write(f'    field(INP, "@asyn($(PORT),0,1)TST_{name.upper()}_VALUE")\n')
+            f.write("}\n")
+    out_path = tmp_path / "out"
+    out_path.mkdir()
+
+    main(
+        argparse.Namespace(
+            input_path=str(tmp_path),
+            output_path=str(out_path),
+            filename=None,
+            macros=None,
+            prefix=None,
+            use_prefix_as_base=False,
+            jobs=1,
+        )
+    )
+    for name in ["first", "second"]:
+        with open(out_path / f"{name}ParamDefs.h") as hf:
+            content = hf.read()
+        param_name = f"{name}_{name.capitalize()}Value"
+        assert f'#define {param_name}String "TST_{name.upper()}_VALUE"' in content
+        assert (out_path / f"{name}ParamDefs.cpp").exists()
+
+
+def test_main_rejects_filename_with_jobs(tmp_path, caplog):
+    for name in ["first", "second"]:
+        (tmp_path / f"{name}.template").touch()
+
+    with pytest.raises(SystemExit) as excinfo:
+        main(
+            argparse.Namespace(
+                input_path=str(tmp_path),
+                output_path=str(tmp_path),
+                filename="Shared",
+                macros=None,
+                prefix=None,
+                use_prefix_as_base=False,
+                jobs=2,
+            )
+        )
+    assert excinfo.value.code == 1
+    assert "--filename cannot be used with --jobs" in caplog.text
+
+
+def test_main_rejects_prefix_as_base_without_prefix(tmp_path, caplog):
+    with pytest.raises(SystemExit) as excinfo:
+        main(
+            argparse.Namespace(
+                input_path=str(tmp_path),
+                output_path=str(tmp_path),
+                filename=None,
+                macros=None,
+                prefix=None,
+                use_prefix_as_base=True,
+                jobs=1,
+            )
+        )
+    assert excinfo.value.code == 1
+    assert "--use-prefix-as-base requires --prefix" in caplog.text